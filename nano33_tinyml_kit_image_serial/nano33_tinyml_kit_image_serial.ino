@@ -1,5 +1,5 @@
 /**
- * Arduino Nano 33 BLE Sense image capture and transmit base64 over serial
+ * Arduino Nano 33 BLE Sense image capture and transmit raw EIML over serial
  * 
  * Author: Shawn Hymel
  * Date: June 15, 2022
@@ -31,7 +31,6 @@
  */
 
 #include <TinyMLShield.h>
-#include "base64.h"             // Used to convert data to Base64 encoding
 
 // Preprocessor settings
 #define BAUD_RATE         230400          // Must match receiver application
@@ -73,7 +72,7 @@ typedef enum
   EIML_ERROR = 1
 } EimlRet;
 
-// Transmission header for raw image (must convert nicely to base64)
+// Transmission header for raw image (sent as binary, followed by pixel data)
 // |     SOF     |  format  |   width   |   height  |
 // | xFF xA0 XFF | [1 byte] | [4 bytes] | [4 bytes] |
 typedef struct EimlHeader
@@ -272,7 +271,7 @@ void loop() {
   // Crop the image as a square in the center of the frame
   static int scale_img_bytes = scale_width * scale_height * cam_bytes_per_pixel;
   static int crop_img_bytes = crop_width * crop_height * cam_bytes_per_pixel;
-  static int rgb888_img_bytes = scale_width * scale_height * rgb888_bytes_per_pixel;
+  static int rgb888_img_bytes = crop_width * crop_height * rgb888_bytes_per_pixel;
 
   // Create capture buffer
   uint8_t *cam_img;
@@ -350,23 +349,8 @@ void loop() {
 
   // Free crop image buffer
   free(crop_img);
-
-  // Create encoded message buffer
-  uint32_t enc_len = (rgb888_img_bytes + 2) / 3 * 4;
-  unsigned char *enc_buf;
-  enc_buf = (unsigned char*)malloc((enc_len + 1) * sizeof(unsigned char));
-  if (!enc_buf) {
-    Serial.println("Could not allocate encoded message buffer");
-    return;
-  }
-
-  // Convert scaled RGB888 image to base64
-  unsigned int num = encode_base64(rgb888_img, rgb888_img_bytes, enc_buf);
-
-  // Free RGB888 image buffer
-  free(rgb888_img);
   
-  // Send encoded image out over serial
+  // Send raw image out over serial
 #if SEND_IMG
 
   // Construct header
@@ -383,15 +367,11 @@ void loop() {
     return;
   }
 
-  // Convert header to base64
-  unsigned char enc_header[(EIML_HEADER_SIZE + 2) / 3 * 4];
-  num = encode_base64(header_buf, EIML_HEADER_SIZE, enc_header);
-
-  // Print header and image body
-  Serial.print((char*)enc_header);
-  Serial.println((char*)enc_buf);
+  // Send header and image body (receiver knows length from header)
+  Serial.write(header_buf, EIML_HEADER_SIZE);
+  Serial.write(rgb888_img, rgb888_img_bytes);
 #endif
 
-  // Free buffers
-  free(enc_buf);
+  // Free RGB888 image buffer
+  free(rgb888_img);
 }
@@ -1,30 +1,38 @@
 import tkinter as tk
 import threading
 import time
-import base64
-import io
+import binascii
+import collections
+import queue
+import struct
 
-# Install with `python -m pip install Pillow pyserial`
+# Install with `python -m pip install Pillow pyserial simplejpeg`
 from PIL import Image, ImageTk
 import serial
 import serial.tools.list_ports
+import simplejpeg
 
 # Settings
 init_baud = 230400          
-max_refresh = 10        # Milliseconds
+rx_timeout = 0.05       # Seconds to block waiting for serial data
+fps_smoothing = 0.9     # Weight of previous FPS average (0 = no smoothing)
+fps_update_period = 0.5 # Seconds between FPS label updates
+fps_stall_time = 5.0    # Seconds without a frame before FPS average restarts
 
-# EIML constants for header
+# EIML constants for header (sent as raw binary, followed by the pixel data)
 # |     SOF     |  format  |   width   |   height  |
 # | xFF xA0 XFF | [1 byte] | [4 bytes] | [4 bytes] |
-EIML_HEADER_SIZE = 12
-EIML_SOF_SIZE = 3
-EIML_FORMAT_SIZE = 1
-EIML_WIDTH_SIZE = 4
-EIML_HEIGHT_SIZE = 4
-EIML_SOF_B64 = b'/6D/'
+EIML_SOF = b'\xFF\xA0\xFF'
+EIML_SOF_SIZE = len(EIML_SOF)
+EIML_HDR = struct.Struct('<BII')     # format, width, height (after SOF)
+EIML_HEADER_SIZE = EIML_SOF_SIZE + EIML_HDR.size
 EIML_RESERVED = 0
 EIML_GRAYSCALE = 1
 EIML_RGB888 = 2
+EIML_MAX_WIDTH = 640       # Protocol limit on raw frame size: bigger headers
+EIML_MAX_HEIGHT = 480      # are rejected (and are most likely a false SOF)
+EIML_BYTES_PER_PIXEL = {EIML_GRAYSCALE: 1, EIML_RGB888: 3}
+EIML_PNM_MAGIC = {EIML_GRAYSCALE: b'P5', EIML_RGB888: b'P6'}    # PGM/PPM
 
 #-------------------------------------------------------------------------------
 # Classes
@@ -35,9 +43,9 @@ class GUI:
     Controls the window used to visualize the received images. Buttons allow for
     connecting to a device and saving images.
     
-    Note that the refresh_ method(s) are called in an independent thread.
-    If another thread calls update_ method(s), data is passed safely between
-    threads using a mutex.
+    Note that the refresh_ method(s) are called in the Tk main loop, scheduled
+    by update_ method(s) from other threads. Data is passed safely between
+    threads using a single-slot deque (older frames are dropped).
     """
     
     def __init__(self, root):
@@ -45,8 +53,13 @@ class GUI:
     
         self.root = root
         
+        # Start JPEG decode thread
+        self.jpeg_task = JpegDecodeTask(self)
+        self.jpeg_task.daemon = True
+        self.jpeg_task.start()
+        
         # Start image Rx thread
-        self.rx_task = ImageRxTask(self)
+        self.rx_task = ImageRxTask(self, self.jpeg_task)
         self.rx_task.daemon = True
         self.rx_task.start()
         
@@ -87,8 +100,12 @@ class GUI:
                                         padx=5,
                                         command=self.on_save_clicked)
 
-        # Create canvas
+        # Create canvas with a single image item that gets updated with each frame
         self.canvas = tk.Canvas(self.frame_main, width=500, height=500)
+        self.canvas_img_id = self.canvas.create_image(0, 0, anchor="nw")
+        self.tk_img = None
+        self.tk_img_key = None
+        self.canvas_size = None
 
         # Lay out widgets on control frame
         self.frame_control.grid(row=0, column=0, padx=5, pady=5, sticky=tk.NW)
@@ -107,11 +124,11 @@ class GUI:
         # Place focus on port entry button by default
         self.entry_port.focus_set()
         
-        # Start refresh loop
-        self.img_mutex = threading.Lock()
-        self.img_mutex.acquire()
-        self.timestamp = time.monotonic()
-        self.canvas.after(max_refresh, self.refresh_image)
+        # Canvas is refreshed whenever a new image is handed over
+        self.latest = collections.deque(maxlen=1)
+        self.timestamp = None
+        self.fps = None
+        self.fps_timestamp = time.monotonic()
         
     def __del__(self):
         """Desctructor: make sure we close that serial port!"""
@@ -123,7 +140,7 @@ class GUI:
         # Check to make sure baud rate is an integer
         try:
             baud_rate = int(self.var_baud.get())
-        except:
+        except (tk.TclError, ValueError):
             print("ERROR: baud rate must be an integer")
             return
         
@@ -139,65 +156,253 @@ class GUI:
         self.button_save.focus_set()
 
     def refresh_image(self):
-        """Update canvas periodically
+        """Update canvas with the newest image
         
-        Updates only happen if there is a new image to be saved. To make this
-        function thread-safe, it checkes if a mutex/lock is available first.
+        Scheduled on the Tk main loop by update_image(). If that image was
+        already replaced by a newer one and drawn, there is nothing to do. To
+        make this function thread-safe, new images are taken from a deque.
         """
     
         # If new image is ready, update the canvas
-        if self.img_mutex.acquire(blocking=False):
+        try:
+            img = self.latest.popleft()
+        except IndexError:
+            img = None
+        if img is not None:
         
-            # If we're interrupted, just fail gracefully
+            # If the window is going away, just fail gracefully
             try:
         
-                # Convert to TkInter image: class member to avoid garbage collection
-                img_w, img_h = self.img.size
-                self.tk_img = ImageTk.PhotoImage(self.img)
-
-                #Show image on canvas
-                self.canvas.create_image(0, 0, anchor="nw", image=self.tk_img)
-                self.canvas.config(width=img_w, height=img_h)
+                # PPM/PGM data: Tk reads it directly, no PIL needed. Reloading a
+                # photo image can grow it but never shrink it, so only reuse the
+                # existing one if the size is unchanged.
+                if isinstance(img, bytes):
+                    magic, img_w, img_h = img[:img.index(b"\n255\n")].split()
+                    img_size = (int(img_w), int(img_h))
+                    if isinstance(self.tk_img, tk.PhotoImage) and \
+                            self.tk_img_key == img_size:
+                        self.tk_img.configure(data=img, format="PPM")
+                    else:
+                        self.tk_img = tk.PhotoImage(data=img, format="PPM")
+                        self.tk_img_key = img_size
+                        self.canvas.itemconfigure(self.canvas_img_id, image=self.tk_img)
+        
+                # PIL image with same size and mode as last time: copy pixels into
+                # existing image
+                elif isinstance(self.tk_img, ImageTk.PhotoImage) and \
+                        self.tk_img_key == (img.size, img.mode):
+                    self.tk_img.paste(img)
+                    img_size = img.size
+                    
+                # Otherwise, convert to new TkInter image and show it on canvas
+                # (class member to avoid garbage collection)
+                else:
+                    self.tk_img = ImageTk.PhotoImage(img)
+                    self.tk_img_key = (img.size, img.mode)
+                    self.canvas.itemconfigure(self.canvas_img_id, image=self.tk_img)
+                    img_size = img.size
+                    
+                # Fit canvas to image
+                if img_size != self.canvas_size:
+                    self.canvas_size = img_size
+                    self.canvas.config(width=img_size[0], height=img_size[1])
+                
+                # Update FPS (moving average). The first frame, or the first one
+                # after a stall, only restarts timing so the gap doesn't skew it.
+                now = time.monotonic()
+                if self.timestamp is None or now - self.timestamp > fps_stall_time:
+                    self.fps = None
+                else:
+                    fps = 1 / max(now - self.timestamp, 1e-6)
+                    if self.fps is None:
+                        self.fps = fps
+                    else:
+                        self.fps = fps_smoothing * self.fps + (1 - fps_smoothing) * fps
+                self.timestamp = now
                 
-                # Update FPS
-                self.fps = 1 / (time.monotonic() - self.timestamp)
-                self.timestamp = time.monotonic()
-                self.var_fps.set("FPS: {:.1f}".format(self.fps))
+                # Only redraw the FPS label every so often
+                if self.fps is not None and \
+                        now - self.fps_timestamp > fps_update_period:
+                    self.fps_timestamp = now
+                    self.var_fps.set("FPS: {:.1f}".format(self.fps))
             
-            except:
+            except tk.TclError:
                 pass
-        
-        self.canvas.after(max_refresh, self.refresh_image)
 
     def update_image(self, img):
         """Method to update the image in the cavas
         
-        This will release a lock to notify the other thread that new image data
-        is ready.
+        This will put the image in a deque and schedule a canvas refresh on the
+        GUI thread. If the previous image hasn't been shown yet, it is dropped.
+        The image can be a PIL image or raw PPM/PGM data (bytes).
         """
+        
+        # Hand new image to GUI thread (pushes out any stale image that the GUI
+        # never got to) and have it update the canvas
+        self.latest.append(img)
+        self.root.after(0, self.refresh_image)
+        
+    def frame_slot_full(self):
+        """Return True if the last image handed over hasn't been shown yet"""
+        return len(self.latest) > 0
+        
+class JpegDecodeTask(threading.Thread):
+    """Background thread to decode JPEG data and send to GUI
     
-        # Save image to class member
-        self.img = img
+    Keeps JPEG decoding (libjpeg-turbo via simplejpeg) off the serial thread so
+    that reading from the port is never stalled by a decode.
+    """
+
+    def __init__(self, parent):
+        """Constructor"""
+
+        self.gui = parent
+        super().__init__()
         
-        # Release lock to notify other thread that it can update the canvas
-        self.img_mutex.release()
+        # Only the newest undecoded JPEG is kept
+        self.jpeg_q = queue.Queue(maxsize=1)
         
-class ImageRxTask(threading.Thread):
-    """Background thread to read image data and send to GUI"""
+    def update_jpeg(self, jpeg):
+        """Method to hand raw JPEG data to the decode thread
+        
+        If the previous JPEG hasn't been decoded yet, it is dropped.
+        """
+        
+        # Throw away stale JPEG that we never got to
+        try:
+            self.jpeg_q.get_nowait()
+        except queue.Empty:
+            pass
+        
+        # Hand new JPEG to decode thread
+        self.jpeg_q.put_nowait(jpeg)
+        
+    def run(self):
+        """Main part of the thread"""
+        
+        # Forever loop
+        while True:
+        
+            # Wait for JPEG data from the Rx thread
+            jpeg = self.jpeg_q.get()
+            
+            # Attempt to decode image and display in GUI
+            try:
+                arr = simplejpeg.decode_jpeg(jpeg, colorspace='RGB')
+                img = Image.fromarray(arr)
+                self.gui.update_image(img)
+            except ValueError:
+                pass
+        
+class StreamFramer:
+    """Splits the incoming serial byte stream into complete messages
+    
+    Messages are either newline-terminated lines (text or base64 JPEG) or raw
+    EIML frames, whose length comes from their header. This is the hot loop of
+    the receiver, so it is kept to a single feed() call per serial read.
+    """
 
-    # Receiver state machine constants
+    # Message types
     RX_STRING = 0
     RX_JPEG = 1
     RX_EIML = 2
 
-    def __init__(self, parent):
+    def __init__(self):
+        """Constructor"""
+        
+        # Where we store received bytes until we have a complete message
+        self.rx_buf = bytearray()
+
+        # Position in buffer where the next search for a message boundary starts
+        self.scan_pos = 0
+        
+    def feed(self, chunk):
+        """Add received bytes and return list of complete (type, msg) tuples"""
+        
+        rx_buf = self.rx_buf
+        rx_buf.extend(chunk)
+        msgs = []
+
+        # Pull out as many complete messages as we have
+        while True:
+
+            # Raw EIML frame: length comes from the header
+            if rx_buf.startswith(EIML_SOF):
+                if len(rx_buf) < EIML_HEADER_SIZE:
+                    break
+                format, width, height = EIML_HDR.unpack_from(rx_buf, EIML_SOF_SIZE)
+                
+                # Not a valid header, so skip the SOF and resync
+                if format not in EIML_BYTES_PER_PIXEL:
+                    del rx_buf[:EIML_SOF_SIZE]
+                    self.scan_pos = 0
+                    continue
+                    
+                # Frames bigger than the protocol limit aren't supported (this
+                # also keeps a false SOF from making us wait forever), so skip
+                # the SOF and resync
+                if not 0 < width <= EIML_MAX_WIDTH or \
+                        not 0 < height <= EIML_MAX_HEIGHT:
+                    print("ERROR: EIML frame size {}x{} not supported (max {}x{})"
+                            .format(width, height, EIML_MAX_WIDTH, EIML_MAX_HEIGHT))
+                    del rx_buf[:EIML_SOF_SIZE]
+                    self.scan_pos = 0
+                    continue
+                
+                # Wait for the rest of the pixel data
+                msg_len = EIML_HEADER_SIZE + \
+                            width * height * EIML_BYTES_PER_PIXEL[format]
+                if len(rx_buf) < msg_len:
+                    break
+                rx_mode = self.RX_EIML
+                
+            # Otherwise, look for newline ('\n') or start of EIML frame
+            # (0xFF never shows up in ASCII/UTF-8 text)
+            else:
+                nl = rx_buf.find(b'\n', self.scan_pos)
+                sof = rx_buf.find(EIML_SOF, self.scan_pos)
+                if nl != -1 and (sof == -1 or nl < sof):
+                    msg_len = nl + 1
+                elif sof != -1:
+                    msg_len = sof
+                else:
+                    # Nothing complete yet, so don't scan it again
+                    self.scan_pos = max(0, len(rx_buf) - EIML_SOF_SIZE + 1)
+                    break
+                
+                # Look for start of JPEG
+                if rx_buf.startswith(b'/9j/'):
+                    rx_mode = self.RX_JPEG
+                else:
+                    rx_mode = self.RX_STRING
+
+            # Pull complete message out of the buffer (view must be released
+            # before the buffer can be resized)
+            with memoryview(rx_buf) as mv:
+                msgs.append((rx_mode, mv[:msg_len].tobytes()))
+            del rx_buf[:msg_len]
+            self.scan_pos = 0
+            
+        return msgs
+
+class ImageRxTask(threading.Thread):
+    """Background thread to read image data and send to GUI"""
+
+    def __init__(self, parent, jpeg_task):
         """Constructor"""
 
         self.gui = parent
+        self.jpeg_task = jpeg_task
         super().__init__()
         
-        # Create serial port
-        self.ser = serial.Serial()
+        # Splits incoming bytes into messages
+        self.framer = StreamFramer()
+        
+        # Create serial port (reads block until data arrives or timeout)
+        self.ser = serial.Serial(timeout=rx_timeout)
+        
+        # Connection requests from the GUI: only this thread touches the port
+        self.connect_q = queue.Queue()
         
         # List ports
         print("Available serial ports:")
@@ -210,7 +415,15 @@ class ImageRxTask(threading.Thread):
         self.close()
             
     def connect(self, port, baud_rate):
-        """Connect to the given serial port"""
+        """Ask the Rx thread to connect to the given serial port
+        
+        The port is (re)opened by the Rx thread itself between reads, so it is
+        never closed out from under a read in progress.
+        """
+        self.connect_q.put((port, baud_rate))
+        
+    def open_port(self, port, baud_rate):
+        """Connect to the given serial port (called from the Rx thread)"""
         
         # Try closing the port first (just in case)
         try:
@@ -236,104 +449,73 @@ class ImageRxTask(threading.Thread):
         
     def run(self):
         """Main part of the thread"""
-    
-        # Rx state machine state
-        rx_mode = self.RX_STRING
-        
-        # Where we store the base64 encoded image message
-        rx_buf = b''
             
         # Forever loop
         while True:
                 
-            # Read bytes if there are some waiting
+            # Handle any connection request from the GUI
             try:
-                if self.ser.in_waiting > 0:
-                    while(self.ser.in_waiting):
-
-                        # Read those bytes
-                        rx_buf = rx_buf + self.ser.read()
+                port, baud_rate = self.connect_q.get_nowait()
+                self.open_port(port, baud_rate)
+            except queue.Empty:
+                pass
+                
+            # Port not open (yet), so wait a bit before trying again
+            if not self.ser.is_open:
+                time.sleep(rx_timeout)
+                continue
+                
+            # Read everything waiting, or block until at least one byte shows up
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                # Device went away, so close port and wait for a reconnect
+                print("ERROR:", e)
+                self.ser.close()
+                continue
+            if not chunk:
+                continue
+                
+            # Handle each complete message
+            for rx_mode, msg in self.framer.feed(chunk):
+            
+                # If the GUI hasn't shown the last image yet, it can't keep up,
+                # so don't spend time decoding this one
+                if rx_mode != StreamFramer.RX_STRING and self.gui.frame_slot_full():
+                    continue
                     
-                        # Look for start of JPEG or EIML header
-                        if rx_mode == self.RX_STRING:
-                            if rx_buf == b'/9j/':
-                                rx_mode = self.RX_JPEG
-                            if rx_buf == EIML_SOF_B64:
-                                rx_mode = self.RX_EIML
-                        
-                        # Look for newline ('\n')
-                        if rx_buf[-1] == 10:
-                        
-                            # If we're not recording anything, print it
-                            if rx_mode == self.RX_STRING:
-                                try:
-                                    print("Recv:", rx_buf.decode("utf-8").strip())
-                                except:
-                                    pass
+                # If we're not recording anything, print it
+                if rx_mode == StreamFramer.RX_STRING:
+                    try:
+                        print("Recv:", msg.decode("utf-8").strip())
+                    except UnicodeDecodeError:
+                        pass
+            
+                # If we're recording the JPEG image data, display it
+                elif rx_mode == StreamFramer.RX_JPEG:
+                    
+                    # Attempt to decode base64 and send to JPEG decoder
+                    # (non-base64 characters like \r\n are ignored)
+                    try:
+                        img_dec = binascii.a2b_base64(msg)
+                        self.jpeg_task.update_jpeg(img_dec)
+                    except binascii.Error:
+                        pass
                         
-                            # If we're recording the JPEG image data, display it
-                            elif rx_mode == self.RX_JPEG:
-                                rx_mode = self.RX_STRING
-                                
-                                # Remove \r\n at the end
-                                rx_buf = rx_buf[:-2]
-                                
-                                # Attempt to decode image and display in GUI
-                                try:
-                                    img_dec = base64.b64decode(rx_buf)
-                                    img_stream = io.BytesIO(img_dec)
-                                    img = Image.open(img_stream)
-                                    self.gui.update_image(img)
-                                except:
-                                    pass
-                                    
-                            # If we're recording the raw image data, display it
-                            elif rx_mode == self.RX_EIML:
-                                rx_mode = self.RX_STRING
-                                
-                                # Remove \r\n at the end
-                                rx_buf = rx_buf[:-2]
-                                
-                                # Attempt to decode image and display in GUI
-                                try:
-                                    # Decode message
-                                    msg_dec = base64.b64decode(rx_buf)
-                                    
-                                    # print(msg_dec[3])
-                                    # print(int.from_bytes(msg_dec[4:8], 'little'))
-                                    # print(int.from_bytes(msg_dec[8:12], 'little'))
-                                    
-                                    # Extract info from header
-                                    idx = EIML_SOF_SIZE
-                                    format = msg_dec[idx]
-                                    idx += EIML_FORMAT_SIZE                                       
-                                    width = int.from_bytes(msg_dec[idx:(idx + EIML_WIDTH_SIZE)], 
-                                                                                        'little')
-                                    idx += EIML_WIDTH_SIZE
-                                    height = int.from_bytes(msg_dec[idx:(idx + EIML_HEIGHT_SIZE)],
-                                                                                        'little')
-                                    idx += EIML_HEIGHT_SIZE
-                                    
-                                    # Create image and update GUI
-                                    if format == EIML_RGB888:
-                                        img = Image.frombytes(  'RGB', 
-                                                                (width, height), 
-                                                                msg_dec[idx:], 
-                                                                'raw')
-                                    self.gui.update_image(img)
-                                    
-                                except:
-                                    print(idx)
-                                    pass
-                            
-                            # Clear buffer
-                            rx_buf = b''
+                # If we're recording the raw image data, display it
+                elif rx_mode == StreamFramer.RX_EIML:
                 
-                # Sleep the thread for a bit if there are no bytes to be read
-                else:
-                    time.sleep(0.001)
-            except:
-                pass
+                    # Extract info from header
+                    format, width, height = EIML_HDR.unpack_from(msg, 
+                                                                EIML_SOF_SIZE)
+                    
+                    # Swap EIML header for a PPM/PGM header so Tk can read the
+                    # pixels directly (one copy, no PIL) and update GUI
+                    ppm_header = b"%s\n%d %d\n255\n" % (EIML_PNM_MAGIC[format], 
+                                                        width, 
+                                                        height)
+                    ppm = ppm_header + memoryview(msg)[EIML_HEADER_SIZE:]
+                    self.gui.update_image(ppm)
 
 #-------------------------------------------------------------------------------
 # Main